@@ -0,0 +1,51 @@
+# Win detection for two-token games on boards that fit a 64 bit bitboard (in the layout used by State, with one spare
+# row), for use in tight loops such as agent search. The functions are compiled with Numba when it is installed and
+# fall back to plain Python otherwise; both versions take and return the same values. The compiled functions use
+# cache=True, so Numba writes its compilation cache into this package's __pycache__ directory. This module is imported
+# lazily by State.check_for_outcome() so that importing connect4 does not import Numba.
+
+try:
+    import numba
+    import numpy as np
+except ImportError:
+    numba = None
+
+
+if numba is None:
+    def any_four(bitboard, height):
+        # True if the bitboard holds four in a row in any direction. height is the number of bits per column.
+        for shift in (1, height, height - 1, height + 1):
+            pairs = bitboard & (bitboard >> shift)
+            if pairs & (pairs >> 2 * shift):
+                return True
+
+        return False
+
+    def check_win(bitboard_0, bitboard_1, height):
+        # Returns the index (0 or 1) of the bitboard holding four in a row, or -1 if neither does.
+        if any_four(bitboard_0, height):
+            return 0
+        if any_four(bitboard_1, height):
+            return 1
+
+        return -1
+
+else:
+    @numba.njit(cache=True, inline='always')
+    def any_four(bitboard, height):
+        bitboard = np.uint64(bitboard)
+        for shift in (np.uint64(1), np.uint64(height), np.uint64(height - 1), np.uint64(height + 1)):
+            pairs = bitboard & (bitboard >> shift)
+            if pairs & (pairs >> (shift + shift)):
+                return True
+
+        return False
+
+    @numba.njit(cache=True)
+    def check_win(bitboard_0, bitboard_1, height):
+        if any_four(bitboard_0, height):
+            return 0
+        if any_four(bitboard_1, height):
+            return 1
+
+        return -1
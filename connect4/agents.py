@@ -53,17 +53,17 @@ class CLIAgent(Agent):
 
     @staticmethod
     def _print_board(view):
-        for row in range(view.board_size[0]):
-            print(
-                ''.join([
-                    '[',
-                    ','.join([
-                        ' ' if token is None else str(token)[0]
-                        for token in view.board[row * view.board_size[1] : (row + 1) * view.board_size[1]]
-                    ]),
-                    ']'
-                ])
-            )
+        board = view.board
+        n_rows, n_columns = view.board_size
+        rows = []
+
+        for row in range(n_rows):
+            cells = [
+                ' ' if token is None else str(token)[0] for token in board[row * n_columns : (row + 1) * n_columns]
+            ]
+            rows.append('[' + ','.join(cells) + ']')
+
+        print('\n'.join(rows))
 
 
 class RandomAgent(Agent):
@@ -73,10 +73,12 @@ class RandomAgent(Agent):
     """
 
     def select_action(self, state_view):
-        open_columns = [
-            index + 1 for index, token in enumerate(state_view.board[:state_view.board_size[1]]) if token is None
-        ]
-        return game.Action(game.Actions.PLACE, random.choice(open_columns))
+        # Pick the k-th set bit of the open column mask by clearing the k lowest, then read off the lowest remaining.
+        open_columns = state_view.open_columns
+        for _ in range(random.randrange(open_columns.bit_count())):
+            open_columns &= open_columns - 1
+
+        return game.Action(game.Actions.PLACE, (open_columns & -open_columns).bit_length())
 
     def notify_outcome(self, outcome):
         pass
@@ -0,0 +1,100 @@
+import numpy as np
+
+from . import agents as agents_module
+from . import game
+
+
+def play_many(n, agents, board_size=(6, 7), seed=None):
+    """
+    Plays n independent games between the same agents in lockstep, for gathering statistics over many games. Each
+    game's board is held as one uint64 bitboard per agent (in the layout used by State), so every ply places a token
+    and checks for a win across all unfinished games at once with a handful of array operations.
+
+    Agents choose columns as they would in Game.play(). RandomAgent choices are drawn directly from the open columns of
+    every game in one step; any other agent is called once per game with a StateView. Agent.notify_outcome() is not
+    called. As in Game.play(), the order of play is shuffled independently for each game.
+
+    Returns an array of length n holding, for each game, the index in agents of the winning agent, or -1 for a draw.
+
+    """
+
+    if not (isinstance(n, int) and not isinstance(n, bool) and n > 0):
+        raise ValueError('Argument "n" must be a strictly positive (>0) int.')
+    game._validate_game_arguments(agents, board_size)
+
+    n_rows, n_columns = board_size
+    if (n_rows + 1) * n_columns > 64:
+        raise ValueError('Argument "board_size" is too large. Boards must fit into a 64 bit bitboard, including one '
+                         'spare row.')
+
+    rng = np.random.default_rng(seed)
+    tokens = tuple(agent.token for agent in agents)
+
+    bitboards = np.zeros((n, len(agents)), dtype=np.uint64)
+    heights = np.zeros((n, n_columns), dtype=np.uint8)
+    column_offsets = np.arange(n_columns, dtype=np.uint64) * np.uint64(n_rows + 1)
+    shifts = [(np.uint64(shift), np.uint64(2 * shift)) for shift in (1, n_rows + 1, n_rows, n_rows + 2)]
+
+    # Each row is a random permutation of agent indices giving the order of play in that game.
+    orders = rng.random((n, len(agents))).argsort(axis=1)
+    winners = np.full(n, -1, dtype=np.intp)
+    # Indices of the games still being played. Every unfinished game has played the same number of plies.
+    active = np.arange(n)
+
+    for ply in range(n_rows * n_columns):
+        if not active.size:
+            break
+
+        current = orders[active, ply % len(agents)]
+        columns = np.empty(active.size, dtype=np.intp)
+
+        for index, agent in enumerate(agents):
+            selected = current == index
+            if not selected.any():
+                continue
+
+            games = active[selected]
+            if type(agent) is agents_module.RandomAgent:
+                columns[selected] = _random_columns(rng, heights[games] < n_rows)
+            else:
+                columns[selected] = [
+                    _select_column(agent, bitboards[game_index], heights[game_index], board_size, tokens)
+                    for game_index in games
+                ]
+
+        if (heights[active, columns] == n_rows).any():
+            raise game.ActionError('Cannot place a token in a full column.')
+
+        moves = np.uint64(1) << (column_offsets[columns] + heights[active, columns])
+        bitboards[active, current] |= moves
+        heights[active, columns] += 1
+
+        board = bitboards[active, current]
+        won = np.zeros(active.size, dtype=bool)
+        for shift, double_shift in shifts:
+            pairs = board & (board >> shift)
+            won |= (pairs & (pairs >> double_shift)) != 0
+
+        winners[active[won]] = current[won]
+        active = active[~won]
+
+    return winners
+
+
+def _random_columns(rng, open_columns):
+    # Picks one open column uniformly at random in each row of the boolean (games, columns) array open_columns.
+    scores = rng.random(open_columns.shape)
+    scores[~open_columns] = -1
+
+    return scores.argmax(axis=1)
+
+
+def _select_column(agent, bitboards, heights, board_size, tokens):
+    # Asks a single agent for its move in one game, returning the 0-indexed column.
+    open_columns = sum(1 << column for column, height in enumerate(heights.tolist()) if height < board_size[0])
+    bitboards = tuple(bitboards.tolist())
+    view = game.StateView(board_size, bitboards, tokens, open_columns, game._zobrist_hash(bitboards, board_size))
+    action = agent.select_action(view)
+    game._validate_action(action, board_size[1])
+
+    return action.place_column - 1
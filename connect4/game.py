@@ -1,6 +1,6 @@
-import bidict
+import array
 import enum
-import itertools
+import functools
 import random
 
 from . import agents as agents_module
@@ -17,51 +17,51 @@ class Game:
 
     def __init__(self, agents, board_size=(6, 7)):
         # User-called method. Validate arguments.
-        if not (isinstance(agents, (list, tuple))):
-            raise TypeError('Unsupported type for argument "agents". Argument must be of type "List" or "Tuple".')
-        if len(agents) < 2:
-            raise ValueError('Argument "agents" must be of at least length 2.')
-        for element in agents:
-            if not isinstance(element, agents_module.Agent):
-                raise TypeError('Unsupported element type in argument "agents". Elements must be of type "Agent".')
-        if not (isinstance(board_size, (list, tuple))):
-            raise TypeError('Unsupported type for argument "board_size". Argument must be of type "List" or "Tuple".')
-        if not len(board_size) == 2:
-            raise ValueError('Argument "board_size" must be of length 2.')
-        for element in board_size:
-            if not isinstance(element, int):
-                raise TypeError('Unsupported element type in argument "board_size". Elements must be of type "int".')
-            if element < 1:
-                raise ValueError('Elements in argument "board_size" must be strictly positive (>0).')
+        _validate_game_arguments(agents, board_size)
 
         self._agents = agents
         self._board_size = board_size
 
     def play(self):
-        # Setup agent cycle, state, and outcome in advance.
-        agents = itertools.cycle(random.sample(self._agents, len(self._agents)))
+        # Setup order of play, state, and outcome in advance.
+        order = random.sample(self._agents, len(self._agents))
+        turn = 0
+        two_players = len(order) == 2
         state = State([agent.token for agent in self._agents], board_size=self._board_size)
         outcome = Outcome(self._agents)
 
+        # Locals for names used every ply.
+        place = Actions.PLACE
+        n_columns = self._board_size[1]
+        expose_view = state.expose_view
+        place_token = state.place_token
+        check_win_from = state.check_win_from
+        append_to_record = outcome.append_to_record
+
         while True:
-            current_agent = next(agents)
-            action = current_agent.select_action(state.expose_view())
+            current_agent = order[turn]
+            # Two players simply alternate.
+            turn = turn ^ 1 if two_players else (turn + 1) % len(order)
+            action = current_agent.select_action(expose_view())
 
             # Never trust an agent to play by the rules. Check for universally invalid actions (independent of state).
-            if action.action is not Actions.PLACE:
-                raise ValueError('In Connect4, only the PLACE action is permitted.')
-            if not isinstance(action.place_column, int):
+            # Valid actions pass the single combined check; anything else is validated in full to raise the right error.
+            try:
+                column = action.place_column
+                valid = action.action is place and type(column) is int and 1 <= column <= n_columns
+            except AttributeError:
                 raise TypeError('Unsupported return type from method Agent.select_action(). Return must be of type '
-                                '"int".')
-            if not (1 <= action.place_column <= self._board_size[1]):
-                raise ValueError('Returned value from Agent.select_action() must lie within the closed interval [0, '
-                                 f'{self._board_size[1]}].')
+                                '"Action".') from None
+
+            if not valid:
+                _validate_action(action, n_columns)
 
             # In the single action game, this is fine. In a multi-action game, this will need to be more generic.
             # Any specific invalid actions (dependent on state) will be caught by the state.
-            state.place_token(action.place_column, current_agent.token)
-            outcome.append_to_record(current_agent.token, action)
-            result = state.check_for_outcome()
+            token = current_agent.token
+            move = place_token(column, token)
+            append_to_record(token, action)
+            result = check_win_from(move, token)
 
             if result[0] is Outcomes.WIN:
                 for agent in outcome.agent_outcomes:
@@ -88,33 +88,71 @@ class State:
 
     """
 
+    __slots__ = ('_int_to_ext', '_ext_to_int', '_n_rows', '_n_columns', '_bitboards', '_heights', '_column_tops',
+                 '_open_columns', '_zobrist_keys', '_hash', '_shifts', '_n_placed', '_n_cells', '_use_fast_check')
+
     def __init__(self, external_tokens, board_size):
-        self._token_map = bidict.bidict({token: value for value, token in enumerate(external_tokens)})
+        # Tokens are tracked internally as their index in external_tokens.
+        self._int_to_ext = tuple(external_tokens)
+        self._ext_to_int = {token: value for value, token in enumerate(self._int_to_ext)}
         self._n_rows, self._n_columns = board_size
 
-        self._board = [None] * self._n_rows * self._n_columns
+        # The board is stored as one bitboard (an int) per token. Bits are laid out column by column, bottom to top,
+        # with one spare sentinel bit on top of each column so that lines can never wrap from one column to the next:
+        # cell (row, column), counted from the bottom left, lives at bit column * (n_rows + 1) + row.
+        self._bitboards = [0] * len(self._int_to_ext)
+        # Index of the next free bit in each column, and of the sentinel bit each one reaches once the column is full.
+        self._heights = [column * (self._n_rows + 1) for column in range(self._n_columns)]
+        self._column_tops = tuple(height + self._n_rows for height in self._heights)
+        # Bit column - 1 is set while column is not full, as in StateView.open_columns.
+        self._open_columns = (1 << self._n_columns) - 1
+        # Zobrist hash of the position, updated incrementally as tokens are placed. See State.zobrist_hash.
+        self._zobrist_keys = _zobrist_keys(self._n_columns * (self._n_rows + 1), len(self._int_to_ext))
+        self._hash = 0
+
+        # Bit shifts stepping one cell along each line direction: vertical |, horizontal --, diagonals \ and /.
+        self._shifts = (1, self._n_rows + 1, self._n_rows, self._n_rows + 2)
+        # Tokens placed so far; the board is full once this reaches the number of cells.
+        self._n_placed = 0
+        self._n_cells = self._n_rows * self._n_columns
+        # Two-token games on boards that fit 64 bits can use the (possibly compiled) win check in the _fast module.
+        self._use_fast_check = len(self._int_to_ext) == 2 and (self._n_rows + 1) * self._n_columns <= 64
+
+    @property
+    def zobrist_hash(self):
+        # A 64 bit hash of the position, for keying a transposition table. Positions reached through different move
+        # orders hash equally. Agents receive the same value as StateView.zobrist_hash.
+        return self._hash
 
     def expose_view(self):
         # Must expose the view as defined by the StateView class.
         return StateView(
-            (self._n_rows, self._n_columns),
-            [token if token is None else self._token_map.inverse[token] for token in self._board]
+            (self._n_rows, self._n_columns), tuple(self._bitboards), self._int_to_ext, self._open_columns, self._hash
         )
 
     def place_token(self, column, token):
-        lowest_open_cell_in_column = None
-
-        for row in range(self._n_rows):
-            if self._board[row * self._n_columns + column - 1] is not None:
-                break
-            else:
-                lowest_open_cell_in_column = row
+        # Returns the bit of the cell the token landed in, which can be passed on to State.check_win_from().
+        heights = self._heights
+        bitboards = self._bitboards
+        index = column - 1
+        bit = heights[index]
+        top = self._column_tops[index]
 
         # If the column is full, that is a state dependent invalid action.
-        if lowest_open_cell_in_column is None:
+        if bit == top:
             raise ActionError(f'Cannot place a token in column {column}. Column is full. Columns are indexed from 1.')
-        else:
-            self._board[lowest_open_cell_in_column * self._n_columns + column - 1] = self._token_map[token]
+
+        value = self._ext_to_int[token]
+        move = 1 << bit
+        bitboards[value] |= move
+        self._hash ^= self._zobrist_keys[bit * len(bitboards) + value]
+        heights[index] = bit + 1
+        self._n_placed += 1
+
+        if bit + 1 == top:
+            self._open_columns &= ~(1 << index)
+
+        return move
 
     def check_for_outcome(self):
         # If the game has been won, returns the tuple (Outcomes.WIN, winning_token).
@@ -123,58 +161,96 @@ class State:
         outcome = None
         winning_token = None
 
-        for line in self._generate_lines():
-            if line[0] is not None and len(set(line)) == 1:
+        bitboards = self._bitboards
+
+        if self._use_fast_check:
+            # Imported here rather than at module level: loading Numba is slow, and Game.play() never reaches this
+            # full scan, so only code that calls it (e.g. search agents) should pay for it.
+            from . import _fast
+
+            winner = _fast.check_win(bitboards[0], bitboards[1], self._n_rows + 1)
+            if winner >= 0:
                 outcome = Outcomes.WIN
-                winning_token = self._token_map.inverse[line[0]]
-                break
+                winning_token = self._int_to_ext[winner]
 
-        if outcome is None and None not in self._board:
+        else:
+            shifts = self._shifts
+            for value, bitboard in enumerate(bitboards):
+                for shift in shifts:
+                    pairs = bitboard & (bitboard >> shift)
+                    if pairs & (pairs >> 2 * shift):
+                        outcome = Outcomes.WIN
+                        winning_token = self._int_to_ext[value]
+                        break
+
+                if outcome is not None:
+                    break
+
+        if outcome is None and self._n_placed == self._n_cells:
             outcome = Outcomes.DRAW
 
         return outcome, winning_token
 
-    def _generate_lines(self):
-        # Horizontal lines: --
-        for row in range(self._n_rows):
-            for column in range(self._n_columns - 3):
-                yield self._board[row * self._n_columns + column : row * self._n_columns + column + 4]
-
-        # Vertical lines: |
-        for row in range(self._n_rows - 3):
-            for column in range(self._n_columns):
-                yield self._board[row * self._n_columns + column
-                                  : (row + 4) * self._n_columns + column: self._n_columns]
-
-        # Diagonal lines: \
-        for row in range(self._n_rows - 3):
-            for column in range(self._n_columns - 3):
-                yield self._board[row * self._n_columns + column
-                                  : (row + 4) * self._n_columns + column + 4
-                                  : self._n_columns + 1]
-
-        # Diagonal lines: /
-        for row in range(self._n_rows - 3):
-            for column in range(3, self._n_columns):
-                yield self._board[row * self._n_columns + column
-                                  : (row + 4) * self._n_columns + column - 4
-                                  : self._n_columns - 1]
+    def check_win_from(self, move, token):
+        # Same return values as State.check_for_outcome(), but only lines through the cell just played are considered.
+        # Only the token just placed can complete a line, so this is all that needs checking after each move. Pass
+        # None as the move to fall back to the full scan.
+        if move is None:
+            return self.check_for_outcome()
+
+        bitboard = self._bitboards[self._ext_to_int[token]]
+
+        for shift in self._shifts:
+            pairs = bitboard & (bitboard >> shift)
+            # Runs of four are marked at their lowest bit, which lies at most three steps below the move.
+            if pairs & (pairs >> 2 * shift) & (move | move >> shift | move >> 2 * shift | move >> 3 * shift):
+                return Outcomes.WIN, token
+
+        if self._n_placed == self._n_cells:
+            return Outcomes.DRAW, None
+
+        return None, None
 
 
 class StateView:
     """
     StateView is a data-only class meant to act as an interface between State and Agent objects.
-    A StateView has two fields:
+    A StateView has the following fields:
         board_size: A 2-tuple of ints specifying the number of rows and columns in the board, in that order.
-        board: A flat list of tokens representing the tokens in each cell of the board. Cells are ordered row-by-row,
+        board: A flat tuple of tokens representing the tokens in each cell of the board. Cells are ordered row-by-row,
                beginning at the upper left cell and ending at the lower right cell. Tokens are passed by reference to
                the original tokens given as arguments to the Game constructor. Empty cells are represented by None.
+               The tuple is only built the first time it is accessed.
+        open_columns: An int bitmask of the columns that are not yet full. Bit i is set if column i + 1 is open.
+        bitboards: A tuple of int bitboards, one per token, in the layout used by State. Agents that do not need the
+                   tokens themselves (e.g. when searching) can work on these directly at no cost.
+        tokens: A tuple of the tokens matching each entry of bitboards.
+        zobrist_hash: A 64 bit int hash of the position, equal for positions reached through different move orders.
+                      Agents can use it to key a transposition table.
+    A StateView is constructed as StateView(board_size, bitboards, tokens, open_columns, zobrist_hash). The board is
+    derived from bitboards and tokens, so it cannot be passed in or assigned.
 
     """
 
-    def __init__(self, board_size, board):
+    __slots__ = ('board_size', 'bitboards', 'tokens', 'open_columns', 'zobrist_hash', '_board')
+
+    def __init__(self, board_size, bitboards, tokens, open_columns, zobrist_hash):
         self.board_size = board_size
-        self.board = board
+        self.bitboards = bitboards
+        self.tokens = tuple(tokens)
+        self.open_columns = open_columns
+        self.zobrist_hash = zobrist_hash
+        self._board = None
+
+    @property
+    def board(self):
+        if self._board is None:
+            self._board = tuple(
+                value if value is None else self.tokens[value]
+                for value in _materialize_board(self.bitboards, self.board_size)
+            )
+
+        return self._board
 
 
 class Action:
@@ -187,6 +263,8 @@ class Action:
 
     """
 
+    __slots__ = ('action', 'place_column')
+
     def __init__(self, action, column):
         self.action = action
         self.place_column = column
@@ -216,12 +294,27 @@ class Outcome:
     An Outcome has the following fields:
         agent_outcomes: A dict of {Agent: Outcomes} pairs for each participating agent.
         record: A list of (token, Action) tuples that can be used to recreate the progress of play during the game.
+                Plies are stored as two parallel arrays of token indices and columns, and the list is rebuilt from them
+                on each access, so each access returns new Action objects rather than those returned by the agents.
 
     """
 
+    __slots__ = ('agent_outcomes', '_tokens', '_token_ids', '_record_tokens', '_record_columns')
+
     def __init__(self, agents):
         self.agent_outcomes = {agent: None for agent in agents}
-        self.record = []
+        self._tokens = tuple(agent.token for agent in agents)
+        self._token_ids = {token: index for index, token in enumerate(self._tokens)}
+        # Unsigned 64 bit entries, so that neither the number of agents nor the board width can overflow them.
+        self._record_tokens = array.array('Q')
+        self._record_columns = array.array('Q')
+
+    @property
+    def record(self):
+        return [
+            (self._tokens[token], Action(Actions.PLACE, column))
+            for token, column in zip(self._record_tokens, self._record_columns)
+        ]
 
     def __str__(self):
         return '\n'.join([
@@ -241,10 +334,86 @@ class Outcome:
         ])
 
     def append_to_record(self, token, action):
-        self.record.append((token, action))
+        self._record_tokens.append(self._token_ids[token])
+        self._record_columns.append(action.place_column)
 
 
 class Outcomes(enum.Enum):
     WIN = enum.auto()
     LOSE = enum.auto()
     DRAW = enum.auto()
+
+
+def _ctz(x):
+    # Index of the lowest set bit in x (count of trailing zeros). x must be positive.
+    return (x & -x).bit_length() - 1
+
+
+def _validate_game_arguments(agents, board_size):
+    # Raises if the agents or board size given to Game (or batch play) are invalid.
+    if not (isinstance(agents, (list, tuple))):
+        raise TypeError('Unsupported type for argument "agents". Argument must be of type "List" or "Tuple".')
+    if len(agents) < 2:
+        raise ValueError('Argument "agents" must be of at least length 2.')
+    for element in agents:
+        if not isinstance(element, agents_module.Agent):
+            raise TypeError('Unsupported element type in argument "agents". Elements must be of type "Agent".')
+    if not (isinstance(board_size, (list, tuple))):
+        raise TypeError('Unsupported type for argument "board_size". Argument must be of type "List" or "Tuple".')
+    if not len(board_size) == 2:
+        raise ValueError('Argument "board_size" must be of length 2.')
+    for element in board_size:
+        if not isinstance(element, int):
+            raise TypeError('Unsupported element type in argument "board_size". Elements must be of type "int".')
+        if element < 1:
+            raise ValueError('Elements in argument "board_size" must be strictly positive (>0).')
+
+
+def _validate_action(action, n_columns):
+    # Raises if the action returned by an agent is invalid regardless of state. Shared by Game.play() and batch play.
+    if action.action is not Actions.PLACE:
+        raise ValueError('In Connect4, only the PLACE action is permitted.')
+    if not isinstance(action.place_column, int):
+        raise TypeError('Unsupported return type from method Agent.select_action(). Return must be of type "int".')
+    if not (1 <= action.place_column <= n_columns):
+        raise ValueError('Returned value from Agent.select_action() must lie within the closed interval [0, '
+                         f'{n_columns}].')
+
+
+def _materialize_board(bitboards, board_size):
+    # Flat list of internal token values (or None) ordered row-by-row from the upper left cell, as in StateView. The
+    # internal value of a token is its index in bitboards.
+    n_rows, n_columns = board_size
+    board = [None] * n_rows * n_columns
+
+    # Visit only the occupied cells, lowest set bit first.
+    for value, bitboard in enumerate(bitboards):
+        while bitboard:
+            column, row = divmod(_ctz(bitboard), n_rows + 1)
+            board[(n_rows - 1 - row) * n_columns + column] = value
+            bitboard &= bitboard - 1
+
+    return board
+
+
+@functools.lru_cache
+def _zobrist_keys(n_bits, n_tokens):
+    # One random 64 bit key per (bitboard bit, internal token value) pair, at index bit * n_tokens + value. Seeded so
+    # that hashes are reproducible between runs.
+    generator = random.Random(0)
+
+    return tuple(generator.getrandbits(64) for _ in range(n_bits * n_tokens))
+
+
+def _zobrist_hash(bitboards, board_size):
+    # Zobrist hash of a position given only its bitboards, matching the hash State maintains incrementally.
+    n_rows, n_columns = board_size
+    keys = _zobrist_keys(n_columns * (n_rows + 1), len(bitboards))
+    zobrist_hash = 0
+
+    for value, bitboard in enumerate(bitboards):
+        while bitboard:
+            zobrist_hash ^= keys[_ctz(bitboard) * len(bitboards) + value]
+            bitboard &= bitboard - 1
+
+    return zobrist_hash